@@ -77,10 +77,13 @@ def get_all_suggestions(experiment_id: str) -> list[SuggestionLog]:
 def get_annotations(experiment_id: str) -> Iterable[LabelledSuggestion]:
     fp = ANNOTATIONS_PATH / f"{experiment_id}.jsonl"
     if fp.exists():
-        for data in read_jsonl(fp):
-            # if "test" in data["who"]:
-            #     continue
-            yield LabelledSuggestion.model_validate(data)
+        with open(fp, encoding="utf-8") as f:
+            for line in f:
+                # validate each line straight from JSON rather than going through a dict
+                annotation = LabelledSuggestion.model_validate_json(line)
+                # if "test" in annotation.who:
+                #     continue
+                yield annotation
 
 
 def get_user_annotations(experiment_id: str, username: str) -> list[LabelledSuggestion]:
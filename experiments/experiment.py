@@ -254,8 +254,8 @@ class Experiment:
                     suggestion = DNDSuggestEntity(
                         entity_type=entity_type,
                         entity=entity,
-                        url=entity.get_embed_url(),
-                        glance_info=entity.get_glance_info(),
+                        url=entity.embed_url,
+                        glance_info=entity.glance_info,
                     )
                     suggestion_tuples.append((entity_type, entity.name, suggestion))
                 # npc matches
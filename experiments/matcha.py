@@ -154,7 +154,7 @@ if __name__ == "__main__":
     print(test_str)
     referenced_entities = asyncio.run(extract_gamedata_entities(test_str, normalize=True))
     for e, match in referenced_entities:
-        print(f"MATCH: {e.name} ({e.get_embed_url()})")
+        print(f"MATCH: {e.name} ({e.embed_url})")
 
     test_str = "Ser Gordon-K'lcetta walks into the room along with the king"
     print(test_str)
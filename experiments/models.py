@@ -83,6 +83,16 @@ class ResetOnDuplicatesOverhearingKani(ResetContextOnDuplicatesMixin, Overhearin
     pass
 
 
+async def connect_realtime_kani(**kwargs) -> OverhearingKaniRealtime:
+    """
+    Return a new OverhearingKaniRealtime, connected with the zero-shot audio prompt and text output.
+    This is the setup shared by the demos and the example server. Any *kwargs* are passed to the kani's constructor.
+    """
+    ai = OverhearingKaniRealtime(**kwargs)
+    await ai.connect(instructions=AUDIO_SYSTEM_PROMPT, modalities=["text"])
+    return ai
+
+
 # ==== experiment config ====
 @dataclasses.dataclass
 class ExperimentConfig:
@@ -1,12 +1,14 @@
+import functools
 import re
 from pathlib import Path
 
 parent_dir = Path(__file__).parent
 
 
+@functools.lru_cache(maxsize=32)
 def read_prompt(name: str):
-    """Read a prompt from this dir and return its contents."""
-    data = (parent_dir / name).read_text()
+    """Read a prompt from this dir and return its contents. Cached, since the same prompts are read by many modules."""
+    data = (parent_dir / name).read_text(encoding="utf-8")
     # do the markdown thing, and replace single line breaks that aren't followed by
     # - other whitespace with normal space
     # - a list or header
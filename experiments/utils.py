@@ -1,4 +1,8 @@
+import asyncio
+import contextlib
 import json
+import mmap
+import os
 import random
 from pathlib import Path
 from typing import AsyncIterable, Iterable
@@ -32,22 +36,34 @@ async def audio_chunks_from_file(
     If random_seek is True, randomly seek to a point in the file (up to 90% through) before yielding.
     Elif seek_to is a positive number, seek to that many seconds through the file.
     """
-    audio = load_audio(fp)
-    audio_len = len(audio)
-    if random_seek:
-        start = random.randrange(0, audio_len - (audio_len // 10), 2)
-    elif seek_to:
-        start = int(48000 * seek_to)
-        start -= start % 2  # make sure we are frame-aligned
-    else:
-        start = 0
-    # 16b, 24kHz = 48kB/sec
-    bytes_per_sec = 48000
-    chunk_size = int(bytes_per_sec * yield_every)
-    for sec in range(start, audio_len, chunk_size):
-        start_time = sec / bytes_per_sec
-        end_time = (sec + chunk_size) / bytes_per_sec
-        yield audio[sec : sec + chunk_size], start_time, end_time
+    with contextlib.ExitStack() as stack:
+        if fp.suffix == ".pcm":
+            # map raw PCM instead of reading it all up front - a full recording is hundreds of MB, and we might only
+            # stream part of it; slicing the map only reads (and copies) that chunk
+            f = stack.enter_context(fp.open("rb"))
+            # an empty file can't be mapped, but there's nothing to read anyway
+            if os.fstat(f.fileno()).st_size:
+                audio = stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            else:
+                audio = b""
+        else:
+            # decoding and resampling blocks for a while, so don't do it on the event loop
+            audio = await asyncio.to_thread(load_audio, fp)
+        audio_len = len(audio)
+        if random_seek:
+            start = random.randrange(0, audio_len - (audio_len // 10), 2)
+        elif seek_to:
+            start = int(48000 * seek_to)
+            start -= start % 2  # make sure we are frame-aligned
+        else:
+            start = 0
+        # 16b, 24kHz = 48kB/sec
+        bytes_per_sec = 48000
+        chunk_size = int(bytes_per_sec * yield_every)
+        for sec in range(start, audio_len, chunk_size):
+            start_time = sec / bytes_per_sec
+            end_time = (sec + chunk_size) / bytes_per_sec
+            yield audio[sec : sec + chunk_size], start_time, end_time
 
 
 # ==== text ====
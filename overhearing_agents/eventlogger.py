@@ -69,27 +69,35 @@ class EventLogger:
             return
         self.last_modified = time.time()
 
-        # if we have audio in the message, write a reference to an audio file instead
-        data = event.model_dump(mode="json")
-        if isinstance(event, (events.KaniMessage, events.RootMessage)) and isinstance(event.msg.content, list):
-            for idx, part in enumerate(event.msg.content):
-                if isinstance(part, AudioPart) and part.audio_b64:
-                    data["msg"]["content"][idx]["audio_b64"] = None
-                    data["msg"]["content"][idx]["audio_file_path"] = self.save_audio(
-                        part.audio_bytes,
-                        fmt="mp3",
-                        role=event.msg.role.value,
-                        subdir="events-audio",
-                        idx=self.event_count.total(),
-                    )
-        if isinstance(event, events.SendAudioMessage):
-            data["data_b64"] = None
-            data["audio_file_path"] = self.save_audio(
-                event.data, fmt="mp3", role="user", subdir="events-audio", idx=self.event_count.total()
-            )
+        is_multipart_message = isinstance(event, (events.KaniMessage, events.RootMessage)) and isinstance(
+            event.msg.content, list
+        )
+        if not is_multipart_message and not isinstance(event, events.SendAudioMessage):
+            # nothing to rewrite, so reuse the JSON shared with the other listeners (e.g. the server's broadcast)
+            line = event.json_dump
+        else:
+            # if we have audio in the message, write a reference to an audio file instead
+            data = event.model_dump(mode="json")
+            if is_multipart_message:
+                for idx, part in enumerate(event.msg.content):
+                    if isinstance(part, AudioPart) and part.audio_b64:
+                        data["msg"]["content"][idx]["audio_b64"] = None
+                        data["msg"]["content"][idx]["audio_file_path"] = self.save_audio(
+                            part.audio_bytes,
+                            fmt="mp3",
+                            role=event.msg.role.value,
+                            subdir="events-audio",
+                            idx=self.event_count.total(),
+                        )
+            if isinstance(event, events.SendAudioMessage):
+                data["data_b64"] = None
+                data["audio_file_path"] = self.save_audio(
+                    event.data, fmt="mp3", role="user", subdir="events-audio", idx=self.event_count.total()
+                )
+            line = json.dumps(data)
 
         # since this is a synch operation we don't need a lock here (though it is thread-unsafe)
-        self.event_file.write(json.dumps(data))
+        self.event_file.write(line)
         self.event_file.write("\n")
         self.event_count[event.type] += 1
 
@@ -103,16 +111,22 @@ class EventLogger:
         states = []
         for ai in self.app.kanis.values():
             state = ai.get_save_state()
-            data = state.model_dump(mode="json")
             # if we have audio in the state, write a reference to an audio file instead
+            # the audio is excluded from the dump so we don't copy every b64 payload just to throw it away
+            audio_fps = {}  # (msg idx, part idx) -> audio file path
+            audio_exclude = {}  # msg idx -> {"content": {part idx: {"audio_b64"}}}
             for idx, msg in enumerate(state.chat_history):
                 if isinstance(msg.content, list):
                     for cidx, part in enumerate(msg.content):
                         if isinstance(part, AudioPart) and part.audio_b64:
-                            data["chat_history"][idx]["content"][cidx]["audio_b64"] = None
-                            data["chat_history"][idx]["content"][cidx]["audio_file_path"] = self.save_audio(
+                            audio_exclude.setdefault(idx, {"content": {}})["content"][cidx] = {"audio_b64"}
+                            audio_fps[idx, cidx] = self.save_audio(
                                 part.audio_bytes, fmt="mp3", role=msg.role.value, subdir="audio", idx=idx
                             )
+            data = state.model_dump(mode="json", exclude={"chat_history": audio_exclude} if audio_exclude else None)
+            for (idx, cidx), audio_fp in audio_fps.items():
+                data["chat_history"][idx]["content"][cidx]["audio_b64"] = None
+                data["chat_history"][idx]["content"][cidx]["audio_file_path"] = audio_fp
             # and save it
             states.append(data)
 
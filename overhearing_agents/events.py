@@ -1,7 +1,8 @@
 import abc
 import base64
 import time
-from typing import Literal, TypeVar
+from functools import cached_property
+from typing import ClassVar, Literal, TypeVar
 
 from kani import ChatMessage, ChatRole
 from pydantic import BaseModel, Field, SerializeAsAny
@@ -13,10 +14,16 @@ from .utils import DynamicSubclassDeser
 class BaseEvent(BaseModel, abc.ABC):
     """The base event that all other events should inherit from."""
 
-    __log_event__ = True  # whether or not the event should be logged
+    # whether or not the event should be logged - set per class, never per instance
+    __log_event__: ClassVar[bool] = True
     type: str
     timestamp: float = Field(default_factory=time.time)
 
+    @cached_property
+    def json_dump(self) -> str:
+        """This event serialized as JSON. Computed once per event and shared by every listener that sends or logs it."""
+        return self.model_dump_json()
+
 
 # server events
 class ServerEvent(BaseEvent):
@@ -69,6 +69,7 @@ class BaseKani(Kani):
         session.on_kani_creation(self)
 
     def dispatch(self, event: events.BaseEvent):
+        """Dispatch an event to the session, if joined. This only enqueues the event; it never blocks on listeners."""
         if self.pa_session is None:
             return
         self.pa_session.dispatch(event)
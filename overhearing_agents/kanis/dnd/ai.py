@@ -4,13 +4,12 @@ from enum import Enum
 from typing import Annotated, Callable, Literal
 
 from kani import AIParam, ai_function
-from pydantic import BaseModel, Field, SerializeAsAny
+from pydantic import BaseModel, Field
 from rapidfuzz import process
 
 from overhearing_agents import config, events
 from overhearing_agents.kanis.base import BaseKani
 from overhearing_agents.state import Suggestion
-from overhearing_agents.utils import DynamicSubclassDeser
 from . import gamedata
 from .gamedata import compendium
 
@@ -70,10 +69,9 @@ class DNDEntityType(Enum):
 
 
 # ==== Foundry payloads ====
-class FoundryAction(DynamicSubclassDeser, BaseModel):
-    """The base class for all Foundry actions."""
+class FoundryAction(BaseModel):
+    """The base class for all Foundry actions. Fields holding any action should be typed as :data:`FoundryActionT`."""
 
-    __discriminator_attr__ = "type"
     type: str
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
 
@@ -112,17 +110,24 @@ class FoundrySendNPCSpeech(FoundryAction):
     text: str
 
 
+# the tagged union of all Foundry actions, discriminated by type
+FoundryActionT = Annotated[
+    FoundryListAllNPCs | FoundryListStageNPCs | FoundryAddNPCToStage | FoundryRemoveNPCFromStage | FoundrySendNPCSpeech,
+    Field(discriminator="type"),
+]
+
+
 class FoundryActionEvent(events.UserEvent):
     """The websocket event for communicating with Foundry VTT."""
 
     type: Literal["foundry_action"] = "foundry_action"
-    action: SerializeAsAny[FoundryAction]
+    action: FoundryActionT
 
 
 # ==== suggestions ====
 class DNDSuggestFoundry(Suggestion):
     suggest_type: Literal["foundry"] = "foundry"
-    action: SerializeAsAny[FoundryAction]
+    action: FoundryActionT
 
 
 class DNDSuggestImprovisedNPC(Suggestion):
@@ -147,13 +152,20 @@ class DNDMixin(BaseKani):
         super().__init__(*args, **kwargs)
         # todo get from foundry on load, this is hardcoded for now
         self.all_npcs = ALL_NPCS
-        self.staged_npcs = []
+        self._all_npcs_set = frozenset(ALL_NPCS)
+        # insertion-ordered set of NPC names
+        self.staged_npcs: dict[str, None] = {}
 
     async def init(self):
         await super().init()
         if not compendium.is_loaded:
             await compendium.load(allowed_sources=config.GAMEDATA_ALLOWED_SOURCES)
 
+    def suggest(self, suggestion: Suggestion):
+        """Show a suggestion to the DM and record it in the session's history. Does not wait for any listeners."""
+        self.dispatch(events.SuggestionEvent(suggestion=suggestion))
+        self.pa_session.suggestion_history.append(suggestion)
+
     # ==== AI functions ====
     # --- NPCs ---
     @ai_function()
@@ -176,7 +188,7 @@ class DNDMixin(BaseKani):
                 return self.all_npcs
             case FoundryStageActionType.list_stage_npcs:
                 self.dispatch(FoundryActionEvent(action=FoundryListStageNPCs()))
-                return self.staged_npcs
+                return list(self.staged_npcs)
             case FoundryStageActionType.add_npc_to_stage:
                 return self._add_npc_to_stage(npc)
             case FoundryStageActionType.remove_npc_from_stage:
@@ -195,48 +207,47 @@ class DNDMixin(BaseKani):
         Call this when the DM describes an NPC speaking to the players.
         ONLY call this function with dialog said by the DM, do not come up with your own dialog. Edits for fluency are allowed.
         """
-        if npc not in self.all_npcs:
+        if npc not in self._all_npcs_set:
             return (
                 f"{npc} is not a configured NPC. The configured NPCs are: {self.all_npcs}. Call this"
                 " function again using one of these names exactly to show it to the players."
             )
         if npc not in self.staged_npcs:
-            self.staged_npcs.append(npc)
+            self.staged_npcs[npc] = None
             out = f'{npc} was added to the stage.\n{npc} said: "{speech}"'
         else:
             out = f'{npc} said: "{speech}"'
         # dispatch to frontend
+        # each line of dialogue is its own suggestion, even in rapid bursts: the frontends render one speech action
+        # per suggestion and the evaluation annotates suggestions by ID, so these must not be coalesced here
         suggestion = DNDSuggestFoundry(action=FoundrySendNPCSpeech(npc_name=npc, text=speech))
-        self.dispatch(events.SuggestionEvent(suggestion=suggestion))
-        self.pa_session.suggestion_history.append(suggestion)
+        self.suggest(suggestion)
         return out
 
     def _add_npc_to_stage(self, npc_name):
-        if npc_name not in self.all_npcs:
+        if npc_name not in self._all_npcs_set:
             return (
                 f"{npc_name} is not a configured NPC. The configured NPCs are: {self.all_npcs}. Call this"
                 " function again using one of these names exactly to show it to the players."
             )
         if npc_name in self.staged_npcs:
             return f"{npc_name} is already on stage. No action taken."
-        self.staged_npcs.append(npc_name)
+        self.staged_npcs[npc_name] = None
         # dispatch to frontend
         suggestion = DNDSuggestFoundry(action=FoundryAddNPCToStage(npc_name=npc_name))
-        self.dispatch(events.SuggestionEvent(suggestion=suggestion))
-        self.pa_session.suggestion_history.append(suggestion)
+        self.suggest(suggestion)
         return f"{npc_name} was added to the stage."
 
     def _remove_npc_from_stage(self, npc_name):
         if npc_name not in self.staged_npcs:
             return (
-                f"{npc_name} is not currently on stage. No action taken. The staged NPCs are: {self.staged_npcs}. Call"
-                " this function again using one of these names exactly to remove the NPC from stage."
+                f"{npc_name} is not currently on stage. No action taken. The staged NPCs are: {list(self.staged_npcs)}."
+                " Call this function again using one of these names exactly to remove the NPC from stage."
             )
-        self.staged_npcs.remove(npc_name)
+        del self.staged_npcs[npc_name]
         # dispatch to frontend
         suggestion = DNDSuggestFoundry(action=FoundryRemoveNPCFromStage(npc_name=npc_name))
-        self.dispatch(events.SuggestionEvent(suggestion=suggestion))
-        self.pa_session.suggestion_history.append(suggestion)
+        self.suggest(suggestion)
         return f"{npc_name} was removed from the stage."
 
     # --- improvised NPCs ---
@@ -249,8 +260,7 @@ class DNDMixin(BaseKani):
         """
         # dispatch to frontend
         suggestion = DNDSuggestImprovisedNPC(race=race, background=background, culture=culture)
-        self.dispatch(events.SuggestionEvent(suggestion=suggestion))
-        self.pa_session.suggestion_history.append(suggestion)
+        self.suggest(suggestion)
         # todo implement - for now, just return a dummy saying that a new NPC was made
         return "A new improvised NPC has been generated and shown to the DM."
 
@@ -271,25 +281,30 @@ class DNDMixin(BaseKani):
         """
         match entity_type:
             case DNDEntityType.any:
-                search_list = list(compendium.all)
+                kind = "all"
             case DNDEntityType.background:
-                search_list = compendium.backgrounds
+                kind = "backgrounds"
             case DNDEntityType.feat:
-                search_list = compendium.feats
+                kind = "feats"
             case DNDEntityType.item:
-                search_list = compendium.items
+                kind = "items"
             case DNDEntityType.race:
-                search_list = compendium.races
+                kind = "races"
             case DNDEntityType.creature:
-                search_list = compendium.creatures
+                kind = "creatures"
             case DNDEntityType.class_feature:
-                search_list = compendium.class_features
+                kind = "class_features"
             case DNDEntityType.spell:
-                search_list = compendium.spells
+                kind = "spells"
             case _:
                 return "Search is not yet implemented for this type."
 
-        result = find_or_search(name, search_list)
+        result = find_or_search(
+            name,
+            getattr(compendium, kind),
+            index=compendium.name_index.get(kind),
+            choice_names=compendium.search_names.get(kind),
+        )
         if isinstance(result, list):
             return self._ambiguous(result)
         return self._gamedata_suggestion(result)
@@ -299,18 +314,16 @@ class DNDMixin(BaseKani):
         entity_type = type(entity).__name__
         # dispatch to frontend
         suggestion = DNDSuggestEntity(
-            entity_type=entity_type, entity=entity, url=entity.get_embed_url(), glance_info=entity.get_glance_info()
+            entity_type=entity_type, entity=entity, url=entity.embed_url, glance_info=entity.glance_info
         )
-        self.dispatch(events.SuggestionEvent(suggestion=suggestion))
-        self.pa_session.suggestion_history.append(suggestion)
+        self.suggest(suggestion)
         # print it
         print("=" * (len(entity_type) + len(entity.qualified_name) + 6))
         print(f"| {entity_type.upper()}: {entity.qualified_name} |")
         print("=" * (len(entity_type) + len(entity.qualified_name) + 6))
         # send the result to the model too
-        entity_data = entity.model_dump(mode="json", exclude_unset=True, exclude_none=True)
         return json.dumps({
-            entity_type: entity_data,
+            entity_type: entity.full_dump,
             "msg": (
                 f"The {entity_type}'s information has been shown to the DM. You do not need to echo any of this"
                 " information to the DM."
@@ -334,31 +347,8 @@ class DNDMixin(BaseKani):
                 f" one of these names exactly to show it to the DM."
             ),
             "results": [
-                {
-                    "name": e.qualified_name,
-                    **e.model_dump(
-                        mode="json",
-                        exclude_unset=True,
-                        exclude_none=True,
-                        include=(  # only include basics for reference
-                            "source",
-                            "type",
-                            "rarity",
-                            "size",
-                            "alignment",
-                            "cr",
-                            "class_name",
-                            "subclass_short_name",
-                            "prerequisite",
-                            "level",
-                            "school",
-                            "time",
-                            "range",
-                            "components",
-                        ),
-                    ),
-                }
-                for e, score in options
+                # only include basics for reference
+                {"name": e.qualified_name, **e.summary_dump} for e, score in options
             ],
         })
 
@@ -367,10 +357,17 @@ def search(
     query: str,
     choices: list[gamedata.GamedataT],
     key: Callable[[gamedata.GamedataT], str] = lambda e: e.qualified_name.lower(),
+    choice_names: list[str] = None,
     **kwargs,
 ) -> list[tuple[gamedata.GamedataT, float]]:
-    """Return a list of (entity, score), sorted by score desc."""
-    choice_names = list(map(key, choices))
+    """
+    Return a list of (entity, score), sorted by score desc.
+
+    :param choice_names: The precomputed ``key(choice)`` of each choice, in the same order. If not given, it is
+        computed on each call.
+    """
+    if choice_names is None:
+        choice_names = list(map(key, choices))
     result = process.extract(query.lower(), choice_names, **kwargs)
     return [(choices[idx], score) for _, score, idx in result]
 
@@ -379,10 +376,20 @@ def find_or_search(
     query: str,
     choices: list[gamedata.GamedataT],
     key: Callable[[gamedata.GamedataT], str] = lambda e: e.qualified_name.lower(),
+    index: dict[str, gamedata.GamedataT] = None,
+    choice_names: list[str] = None,
     **kwargs,
 ) -> gamedata.GamedataT | list[tuple[gamedata.GamedataT, float]]:
-    """Like search(), but returns only the match if it is a perfect match, otherwise returns search results."""
-    results = search(query, choices, key=key, **kwargs)
+    """
+    Like search(), but returns only the match if it is a perfect match, otherwise returns search results.
+
+    :param index: A precomputed mapping of ``key(choice) -> choice``. If given, an exact match is looked up in it
+        before falling back to fuzzy search.
+    :param choice_names: See :func:`search`.
+    """
+    if index is not None and (hit := index.get(query.lower())) is not None:
+        return hit
+    results = search(query, choices, key=key, choice_names=choice_names, **kwargs)
     if results and results[0][1] == 100:
         return results[0][0]
     return results
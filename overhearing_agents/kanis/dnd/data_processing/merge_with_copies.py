@@ -1,3 +1,4 @@
+import copy
 import json
 import re
 from pathlib import Path
@@ -7,30 +8,52 @@ monsters_by_name_and_source = {}
 templates_by_name_and_source = {}
 BESTIARY_DIR = Path(__file__).parents[1] / "data/bestiary"
 
+
+def ref_key(ref):
+    """The lookup key for a monster, template, or a reference to one. Compute it once per reference."""
+    return ref["name"].lower(), ref["source"]
+
+
 # load them all
-for fp in BESTIARY_DIR.glob(f"bestiary-*.json"):
+# sorted so that the order doesn't depend on the filesystem
+for fp in sorted(BESTIARY_DIR.glob(f"bestiary-*.json")):
     with open(fp) as f:
         data = json.load(f)
         for monster in data["monster"]:
-            monsters_by_name_and_source[(monster["name"].lower(), monster["source"])] = monster
+            monsters_by_name_and_source[ref_key(monster)] = monster
             monsters.append(monster)
 with open(BESTIARY_DIR / "template.json") as f:
     for t in json.load(f)["monsterTemplate"]:
-        templates_by_name_and_source[(t["name"].lower(), t["source"])] = t
+        templates_by_name_and_source[ref_key(t)] = t
+
+# keep the monster order of the existing merged file, if there is one: the gamedata loader resolves duplicate names to
+# the first monster with that name, and copies of copies resolve differently depending on which is processed first,
+# so regenerating the file shouldn't reorder it
+# a monster that isn't in it under the same name (e.g. a copy's mods renamed it) stays after the one loaded before it
+if Path("monsters-merged.json").exists():
+    with open("monsters-merged.json") as f:
+        existing_order = {(m["name"], m["source"]): idx for idx, m in enumerate(json.load(f)["monster"])}
+    order_keys = {}
+    last_idx = -1
+    for monster in monsters:
+        last_idx = existing_order.get((monster["name"], monster["source"]), last_idx)
+        order_keys[id(monster)] = last_idx
+    monsters.sort(key=lambda m: order_keys[id(m)])
 
 
 # ==== operations (inplace) ====
 def apply_template(mon, template):
-    template_mon = templates_by_name_and_source[(template["name"].lower(), template["source"])]
+    template_key = ref_key(template)
+    template_mon = templates_by_name_and_source[template_key]
     if "_copy" in template_mon:
         copy_details = template_mon.pop("_copy")
-        template_mon_src = templates_by_name_and_source[(copy_details["name"].lower(), copy_details["source"])]
+        template_mon_src = templates_by_name_and_source[ref_key(copy_details)]
         template_mon = {**template_mon_src, **template_mon}
         # run replacements
         for field, op in copy_details.get("_mod", {}).items():
             # print(field, op)
             apply_op(template_mon, field, op)
-        templates_by_name_and_source[(template["name"].lower(), template["source"])] = template_mon
+        templates_by_name_and_source[template_key] = template_mon
 
     apps = template_mon["apply"]
     for k, v in apps.get("_root", {}).items():
@@ -45,7 +68,8 @@ def apply_op(mon, field, op):
             apply_op(mon, field, o)
         return
     if field == "*":
-        for f in mon:
+        # snapshot the fields since ops can add or remove them
+        for f in list(mon):
             apply_op(mon, f, op)
         return
 
@@ -120,13 +144,32 @@ def apply_op(mon, field, op):
             print("UNHANDLED MOD OP:", op)
 
 
+def touched_fields(copy_details) -> set[str] | None:
+    """The top-level fields that a copy's mod ops may modify, or None if they could modify any field."""
+    fields = set()
+    for field, op in copy_details.get("_mod", {}).items():
+        if field == "*":
+            return None
+        fields.add(field)
+        for o in op if isinstance(op, list) else [op]:
+            if isinstance(o, dict) and o.get("mode") == "setProp":
+                fields.add(o["prop"].split(".")[0])
+    return fields
+
+
 def do_copy(mon):
     print(f"===== Copying to {mon['name']} =====")
     copy_details = mon.pop("_copy")
     # print(copy_details)
     # copy from base
-    source_mon = monsters_by_name_and_source[(copy_details["name"].lower(), copy_details["source"])]
+    source_mon = monsters_by_name_and_source[ref_key(copy_details)]
     out = {**source_mon, **mon}
+    # deepcopy the inherited fields we might modify so that in-place ops don't leak into the source (and everything
+    # else copied from it); the rest can stay shared
+    touched = touched_fields(copy_details)
+    inherited = source_mon.keys() - mon.keys()
+    for field in inherited if touched is None else inherited & touched:
+        out[field] = copy.deepcopy(out[field])
     # apply templates
     for template in copy_details.get("_templates", []):
         apply_template(mon, template)
@@ -1,10 +1,11 @@
 import itertools
 import json
 from pathlib import Path
-from typing import Iterable, TypeVar
+from typing import Annotated, TypeVar
 
 import aiofiles
-import pydantic
+from pydantic import Field, TypeAdapter
+from typing_extensions import TypedDict
 
 from .gamedata_models import (
     Background,
@@ -29,6 +30,30 @@ GAMEDATA_PROCESSING_DIR = Path(__file__).parent / "data_processing"
 GamedataT = TypeVar("GamedataT", bound=GamedataEntity)
 
 
+# key -> entity type pairs -> validator for a datafile with a list of each type under its key
+# built lazily on first load and then reused, so importing the models doesn't pay for building every validator
+_file_adapters: dict[tuple[tuple[str, type], ...], TypeAdapter] = {}
+
+
+def _get_file_adapter(types: dict[str, type[GamedataEntity]]) -> TypeAdapter:
+    """
+    Get a validator for a datafile's top-level object, which only validates the list under each key as its type.
+    Invalid entities are left as plain dicts.
+    """
+    cache_key = tuple(types.items())
+    if cache_key not in _file_adapters:
+        datafile_t = TypedDict(
+            f"{''.join(t.__name__ for t in types.values())}Datafile",
+            # some monsters don't actually have all the info needed
+            # rather than failing the whole file, a row falls back to a dict if it isn't a valid entity - this is a
+            # union in pydantic-core, so the valid rows don't run any Python code to get there
+            {key: list[Annotated[t | dict, Field(union_mode="left_to_right")]] for key, t in types.items()},
+            total=False,
+        )
+        _file_adapters[cache_key] = TypeAdapter(datafile_t)
+    return _file_adapters[cache_key]
+
+
 class Gamedata:
     def __init__(self):
         self.backgrounds: list[Background] = []
@@ -47,37 +72,57 @@ class Gamedata:
         self.spells: list[Spell] = []
         self.rules = []  # todo
 
+        # derived - these are built once after load, see _build_derived
+        self._all_items: list[Item | ItemGroup | BaseItem] = []
+        self._all_races: list[Race | Subrace] = []
+        self._all_classes: list[Class | Subclass] = []
+        self._all_class_features: list[ClassFeature | SubclassFeature | OptionalFeature] = []
+        self._all: list[GamedataEntity] = []
+        # entity list name -> lowercased qualified name -> entity; built after load
+        self.name_index: dict[str, dict[str, GamedataEntity]] = {}
+        # entity list name -> lowercased qualified name of each entity in that list, in order; built after load
+        self.search_names: dict[str, list[str]] = {}
+
         self.is_loaded = False
 
     # derived
     @property
-    def items(self):
-        return self._items + self._item_groups + self._base_items
+    def items(self) -> list[Item | ItemGroup | BaseItem]:
+        return self._all_items
 
     @property
-    def races(self):
-        return self._races + self._subraces
+    def races(self) -> list[Race | Subrace]:
+        return self._all_races
 
     @property
-    def classes(self):
-        return self._classes + self._subclasses
+    def classes(self) -> list[Class | Subclass]:
+        return self._all_classes
 
     @property
-    def class_features(self):
-        return self._class_features + self._subclass_features + self._optional_features
+    def class_features(self) -> list[ClassFeature | SubclassFeature | OptionalFeature]:
+        return self._all_class_features
 
     @property
-    def all(self) -> Iterable[GamedataT]:
-        # noinspection PyTypeChecker
-        return itertools.chain(
-            self.backgrounds,
-            self.feats,
-            self.items,
-            self.races,
-            self.creatures,
-            self.classes,
-            self.class_features,
-            self.spells,
+    def all(self) -> list[GamedataEntity]:
+        return self._all
+
+    def _build_derived(self):
+        """Build the combined entity lists. Called after (re)loading, since the lists are otherwise not mutated."""
+        self._all_items = self._items + self._item_groups + self._base_items
+        self._all_races = self._races + self._subraces
+        self._all_classes = self._classes + self._subclasses
+        self._all_class_features = self._class_features + self._subclass_features + self._optional_features
+        self._all = list(
+            itertools.chain(
+                self.backgrounds,
+                self.feats,
+                self.items,
+                self.races,
+                self.creatures,
+                self.classes,
+                self.class_features,
+                self.spells,
+            )
         )
 
     # load
@@ -87,16 +132,15 @@ class Gamedata:
             GAMEDATA_DIR / "backgrounds.json", Background, allowed_sources=allowed_sources
         )
         self.feats = await self.read_datafile_as(GAMEDATA_DIR / "feats.json", Feat, allowed_sources=allowed_sources)
-        self._items = await self.read_datafile_as(GAMEDATA_DIR / "items.json", Item, allowed_sources=allowed_sources)
-        self._item_groups = await self.read_datafile_as(
-            GAMEDATA_DIR / "items.json", ItemGroup, "itemGroup", allowed_sources=allowed_sources
+        # files with more than one kind of entity are only read once
+        items = await self.read_datafile_as_many(
+            GAMEDATA_DIR / "items.json", {"item": Item, "itemGroup": ItemGroup}, allowed_sources=allowed_sources
         )
         self._base_items = await self.read_datafile_as(
             GAMEDATA_DIR / "items-base.json", BaseItem, "baseitem", allowed_sources=allowed_sources
         )
-        self._races = await self.read_datafile_as(GAMEDATA_DIR / "races.json", Race, allowed_sources=allowed_sources)
-        self._subraces = await self.read_datafile_as(
-            GAMEDATA_DIR / "races.json", Subrace, "subrace", allowed_sources=allowed_sources
+        races = await self.read_datafile_as_many(
+            GAMEDATA_DIR / "races.json", {"race": Race, "subrace": Subrace}, allowed_sources=allowed_sources
         )
         self._optional_features = await self.read_datafile_as(
             GAMEDATA_DIR / "optionalfeatures.json", OptionalFeature, allowed_sources=allowed_sources
@@ -105,23 +149,47 @@ class Gamedata:
         self.creatures = await self.read_datafile_as(
             GAMEDATA_PROCESSING_DIR / "monsters-merged.json", Monster, "monster", allowed_sources=allowed_sources
         )
-        self._classes = await self.read_indexed_dir_as(
-            GAMEDATA_DIR / "class", Class, "class", allowed_sources=allowed_sources
-        )
-        self._subclasses = await self.read_indexed_dir_as(
-            GAMEDATA_DIR / "class", Subclass, "subclass", allowed_sources=allowed_sources
-        )
-        self._class_features = await self.read_indexed_dir_as(
-            GAMEDATA_DIR / "class", ClassFeature, "classFeature", allowed_sources=allowed_sources
-        )
-        self._subclass_features = await self.read_indexed_dir_as(
-            GAMEDATA_DIR / "class", SubclassFeature, "subclassFeature", allowed_sources=allowed_sources
+        classes = await self.read_indexed_dir_as_many(
+            GAMEDATA_DIR / "class",
+            {"class": Class, "subclass": Subclass, "classFeature": ClassFeature, "subclassFeature": SubclassFeature},
+            allowed_sources=allowed_sources,
         )
         self.spells = await self.read_indexed_dir_as(
             GAMEDATA_DIR / "spells", Spell, "spell", allowed_sources=allowed_sources
         )
+        self._items, self._item_groups = items["item"], items["itemGroup"]
+        self._races, self._subraces = races["race"], races["subrace"]
+        self._classes, self._subclasses = classes["class"], classes["subclass"]
+        self._class_features, self._subclass_features = classes["classFeature"], classes["subclassFeature"]
+        self._build_derived()
+        self.build_name_index()
         self.is_loaded = True
 
+    def build_name_index(self):
+        """
+        Build the exact-name lookup and the list of names to fuzzy search for each searchable entity list.
+        The first entity with a given name wins the exact-name lookup.
+        """
+        self.name_index = {}
+        self.search_names = {}
+        for kind in (
+            "backgrounds",
+            "feats",
+            "items",
+            "races",
+            "creatures",
+            "classes",
+            "class_features",
+            "spells",
+            "all",
+        ):
+            names = [e.qualified_name.lower() for e in getattr(self, kind)]
+            index = {}
+            for name, e in zip(names, getattr(self, kind)):
+                index.setdefault(name, e)
+            self.name_index[kind] = index
+            self.search_names[kind] = names
+
     @staticmethod
     async def read_datafile_raw(fp: Path, key: str = None) -> list[dict]:
         if key is None:
@@ -136,37 +204,56 @@ class Gamedata:
         self, fp: Path, t: type[GamedataT], key: str = None, *, allowed_sources=None
     ) -> list[GamedataT]:
         """Load a datafile and return the list of entities under the given key, with source filtering"""
+        if key is None:
+            key = fp.stem.rstrip("s")
+        result = await self.read_datafile_as_many(fp, {key: t}, allowed_sources=allowed_sources)
+        return result[key]
+
+    async def read_datafile_as_many(
+        self, fp: Path, types: dict[str, type[GamedataEntity]], *, allowed_sources=None
+    ) -> dict[str, list[GamedataEntity]]:
+        """Load a datafile once and return the list of entities under each given key, with source filtering"""
         if allowed_sources is not None:
             allowed_sources = {s.lower() for s in allowed_sources}
-        data = await self.read_datafile_raw(fp, key)
-        out = []
-        for d in data:
-            try:
-                e = t.model_validate(d)
-                if allowed_sources is not None and e.source.lower() not in allowed_sources:
-                    continue
-                if e.exclude_from_compendium():
-                    continue
-                out.append(e)
-            except pydantic.ValidationError:
-                # some monsters don't actually have all the info needed
-                # just continue
-                continue
-        return out
+        async with aiofiles.open(fp, "rb") as f:
+            raw = await f.read()
+        # validate straight from the JSON bytes so we never build the intermediate dicts
+        # (model_construct isn't faster than this: json.loads + construct costs about the same for monsters, and it
+        # would skip building nested models and dropping the incomplete ones)
+        data = _get_file_adapter(types).validate_json(raw)
+        return {
+            key: [
+                e
+                for e in data.get(key, [])
+                if not isinstance(e, dict)
+                and (allowed_sources is None or e.source_lower in allowed_sources)
+                and not e.exclude_from_compendium()
+            ]
+            for key in types
+        }
 
     async def read_indexed_dir_as(
         self, fp: Path, t: type[GamedataT], key: str = None, *, allowed_sources=None
     ) -> list[GamedataT]:
         """Load a dir, merging files by the index.json file in that dir"""
+        if key is None:
+            key, *_ = fp.stem.split("-")
+        result = await self.read_indexed_dir_as_many(fp, {key: t}, allowed_sources=allowed_sources)
+        return result[key]
+
+    async def read_indexed_dir_as_many(
+        self, fp: Path, types: dict[str, type[GamedataEntity]], *, allowed_sources=None
+    ) -> dict[str, list[GamedataEntity]]:
+        """Load a dir, merging files by the index.json file in that dir, reading each file once for all given keys"""
         assert fp.is_dir()
         async with aiofiles.open(fp / "index.json") as f:
             index = json.loads(await f.read())  # src -> datafile name
 
-        out = []
+        out = {key: [] for key in types}
         for df in index.values():
-            if key is None:
-                key, *_ = fp.stem.split("-")
-            out.extend(await self.read_datafile_as(fp / df, t, key, allowed_sources=allowed_sources))
+            result = await self.read_datafile_as_many(fp / df, types, allowed_sources=allowed_sources)
+            for key in types:
+                out[key].extend(result[key])
         return out
 
 
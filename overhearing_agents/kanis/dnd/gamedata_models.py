@@ -11,6 +11,7 @@ datamodel-codegen \
 """
 
 import re
+from functools import cache, cached_property
 from typing import Any
 
 from pydantic import BaseModel, ConfigDict, Field
@@ -18,13 +19,41 @@ from pydantic.alias_generators import to_camel
 
 from overhearing_agents.config import GAMEDATA_BASE_URL
 
+_URLENCODE_TABLE = str.maketrans({" ": "%20", "+": "%2b", ";": "%3b"})
+_SLUG_STRIP_RE = re.compile(r"[^a-zA-Z ]")
+
 
 def partial_urlencode(s):
-    return s.replace(" ", "%20").replace("+", "%2b").replace(";", "%3b")
+    return s.translate(_URLENCODE_TABLE)
 
 
 def slugify(s):
-    return re.sub(r"[^a-zA-Z ]", "", s).replace(" ", "-").lower()
+    return _SLUG_STRIP_RE.sub("", s).replace(" ", "-").lower()
+
+
+@cache
+def lower_source(source: str) -> str:
+    """Lowercase a source abbreviation. There are only a few distinct sources, so each is only lowercased once."""
+    return source.lower()
+
+
+# the fields included in an entity's summary_dump
+SUMMARY_FIELDS = {
+    "source",
+    "type",
+    "rarity",
+    "size",
+    "alignment",
+    "cr",
+    "class_name",
+    "subclass_short_name",
+    "prerequisite",
+    "level",
+    "school",
+    "time",
+    "range",
+    "components",
+}
 
 
 class GamedataBase(BaseModel):
@@ -39,6 +68,10 @@ class GamedataEntity(GamedataBase):
     def qualified_name(self):
         return self.name
 
+    @property
+    def source_lower(self) -> str:
+        return lower_source(self.source)
+
     def get_embed_url(self) -> str:
         """Return a URL that embeds this entity in an iframe."""
         return "http://example.com"
@@ -51,6 +84,26 @@ class GamedataEntity(GamedataBase):
         """Return True if this entity shouldn't be included in compendium."""
         return False
 
+    @cached_property
+    def embed_url(self) -> str:
+        """The result of get_embed_url. Computed once per entity."""
+        return self.get_embed_url()
+
+    @cached_property
+    def glance_info(self) -> str | None:
+        """The result of get_glance_info. Computed once per entity."""
+        return self.get_glance_info()
+
+    @cached_property
+    def full_dump(self) -> dict:
+        """All the set fields of this entity, in JSON mode. Computed once per entity."""
+        return self.model_dump(mode="json", exclude_unset=True, exclude_none=True)
+
+    @cached_property
+    def summary_dump(self) -> dict:
+        """Only the basic reference fields of this entity, in JSON mode. Computed once per entity."""
+        return self.model_dump(mode="json", exclude_unset=True, exclude_none=True, include=SUMMARY_FIELDS)
+
 
 # =============================
 # backgrounds
@@ -79,7 +132,7 @@ class Background(GamedataEntity):
 
     def get_embed_url(self) -> str:
         name_enc = partial_urlencode(self.name)
-        return f"{GAMEDATA_BASE_URL}/backgrounds.html#{name_enc}_{self.source.lower()}"
+        return f"{GAMEDATA_BASE_URL}/backgrounds.html#{name_enc}_{self.source_lower}"
 
 
 # books
@@ -95,7 +148,7 @@ class Book(GamedataEntity):
     alias: list | None = None
 
     def get_embed_url(self) -> str:
-        return f"{GAMEDATA_BASE_URL}/book.html#{self.source.lower()}"
+        return f"{GAMEDATA_BASE_URL}/book.html#{self.source_lower}"
 
 
 # feats
@@ -125,7 +178,7 @@ class Feat(GamedataEntity):
 
     def get_embed_url(self) -> str:
         name_enc = partial_urlencode(self.name)
-        return f"{GAMEDATA_BASE_URL}/feats.html#{name_enc}_{self.source.lower()}"
+        return f"{GAMEDATA_BASE_URL}/feats.html#{name_enc}_{self.source_lower}"
 
 
 # items
@@ -229,7 +282,7 @@ class Item(GamedataEntity):
 
     def get_embed_url(self) -> str:
         name_enc = slugify(self.name)
-        return f"{GAMEDATA_BASE_URL}/items/{name_enc}-{self.source.lower()}.html"
+        return f"{GAMEDATA_BASE_URL}/items/{name_enc}-{self.source_lower}.html"
 
     def get_glance_info(self) -> str | None:
         out = []
@@ -303,7 +356,7 @@ class ItemGroup(GamedataEntity):
 
     def get_embed_url(self) -> str:
         name_enc = slugify(self.name)
-        return f"{GAMEDATA_BASE_URL}/items/{name_enc}-{self.source.lower()}.html"
+        return f"{GAMEDATA_BASE_URL}/items/{name_enc}-{self.source_lower}.html"
 
     def get_glance_info(self) -> str | None:
         out = []
@@ -374,7 +427,7 @@ class BaseItem(GamedataEntity):
 
     def get_embed_url(self) -> str:
         name_enc = slugify(self.name)
-        return f"{GAMEDATA_BASE_URL}/items/{name_enc}-{self.source.lower()}.html"
+        return f"{GAMEDATA_BASE_URL}/items/{name_enc}-{self.source_lower}.html"
 
     def get_glance_info(self) -> str | None:
         out = []
@@ -431,7 +484,7 @@ class Race(GamedataEntity):
 
     def get_embed_url(self) -> str:
         name_enc = partial_urlencode(self.name)
-        return f"{GAMEDATA_BASE_URL}/races.html#{name_enc}_{self.source.lower()}"
+        return f"{GAMEDATA_BASE_URL}/races.html#{name_enc}_{self.source_lower}"
 
 
 class Subrace(GamedataEntity):
@@ -474,7 +527,7 @@ class Subrace(GamedataEntity):
     def get_embed_url(self) -> str:
         race_name_enc = partial_urlencode(self.race_name)
         subrace_name_enc = partial_urlencode(self.name)
-        return f"{GAMEDATA_BASE_URL}/races.html#{race_name_enc}%20({subrace_name_enc})_{self.source.lower()}"
+        return f"{GAMEDATA_BASE_URL}/races.html#{race_name_enc}%20({subrace_name_enc})_{self.source_lower}"
 
     def exclude_from_compendium(self):
         return self.name is None
@@ -583,7 +636,7 @@ class Monster(GamedataEntity):
 
     def get_embed_url(self) -> str:
         name_enc = slugify(self.name)
-        return f"{GAMEDATA_BASE_URL}/bestiary/{name_enc}-{self.source.lower()}.html"
+        return f"{GAMEDATA_BASE_URL}/bestiary/{name_enc}-{self.source_lower}.html"
 
     def exclude_from_compendium(self):
         return self.is_npc
@@ -622,7 +675,7 @@ class Class(GamedataEntity):
 
     def get_embed_url(self) -> str:
         name_enc = partial_urlencode(self.name)
-        return f"{GAMEDATA_BASE_URL}/classes.html#{name_enc}_{self.source.lower()}"
+        return f"{GAMEDATA_BASE_URL}/classes.html#{name_enc}_{self.source_lower}"
 
 
 class Subclass(GamedataEntity):
@@ -649,7 +702,7 @@ class Subclass(GamedataEntity):
     def get_embed_url(self) -> str:
         class_name_enc = partial_urlencode(self.class_name)
         name_enc = partial_urlencode(self.name)
-        return f"{GAMEDATA_BASE_URL}/classes.html#{class_name_enc}_{self.class_source.lower()},state:sub_{name_enc}_{self.source.lower()}=b1"
+        return f"{GAMEDATA_BASE_URL}/classes.html#{class_name_enc}_{lower_source(self.class_source)},state:sub_{name_enc}_{self.source_lower}=b1"
 
 
 class ClassFeature(GamedataEntity):
@@ -670,7 +723,7 @@ class ClassFeature(GamedataEntity):
 
     def get_embed_url(self) -> str:
         class_name_enc = partial_urlencode(self.class_name)
-        return f"{GAMEDATA_BASE_URL}/classes.html#{class_name_enc}_{self.class_source.lower()},state:feature=s{self.level-1}-0"
+        return f"{GAMEDATA_BASE_URL}/classes.html#{class_name_enc}_{lower_source(self.class_source)},state:feature=s{self.level-1}-0"
 
 
 class SubclassFeature(GamedataEntity):
@@ -694,7 +747,7 @@ class SubclassFeature(GamedataEntity):
     def get_embed_url(self) -> str:
         class_name_enc = partial_urlencode(self.class_name)
         subclass_name_enc = partial_urlencode(self.subclass_short_name)
-        return f"{GAMEDATA_BASE_URL}/classes.html#{class_name_enc}_{self.class_source.lower()},state:sub_{subclass_name_enc}_{self.subclass_source.lower()}=b1~feature=s{self.level-1}-0"
+        return f"{GAMEDATA_BASE_URL}/classes.html#{class_name_enc}_{lower_source(self.class_source)},state:sub_{subclass_name_enc}_{lower_source(self.subclass_source)}=b1~feature=s{self.level-1}-0"
 
 
 class OptionalFeature(GamedataEntity):
@@ -716,10 +769,12 @@ class OptionalFeature(GamedataEntity):
 
     def get_embed_url(self) -> str:
         name_enc = partial_urlencode(self.name)
-        return f"{GAMEDATA_BASE_URL}/optionalfeatures.html#{name_enc}_{self.source.lower()}"
+        return f"{GAMEDATA_BASE_URL}/optionalfeatures.html#{name_enc}_{self.source_lower}"
 
 
 # spells
+# these leaf models stay models rather than TypedDicts: they keep extra keys (e.g. components.r) and their glance
+# methods, and validating every spell in the compendium only takes ~15ms anyway
 class SpellTime(GamedataBase):
     number: int
     unit: str
@@ -803,15 +858,20 @@ class Spell(GamedataEntity):
 
     def get_embed_url(self) -> str:
         name_enc = slugify(self.name)
-        return f"{GAMEDATA_BASE_URL}/spells/{name_enc}-{self.source.lower()}.html"
+        return f"{GAMEDATA_BASE_URL}/spells/{name_enc}-{self.source_lower}.html"
 
     # def get_embed_url(self) -> str:
     #     name_enc = partial_urlencode(self.name)
     #     return f"{GAMEDATA_BASE_URL}/spells.html#{name_enc}_{self.source.lower()}"
 
+    @cached_property
+    def concentration(self) -> bool:
+        """Whether any of this spell's durations requires concentration. Computed once per spell."""
+        return any("concentration" in t and t["concentration"] for t in self.duration)
+
     def get_glance_info(self) -> str | None:
         time = "Special" if len(self.time) != 1 else self.time[0].get_glance_info()
-        conc = "(conc.)" if any("concentration" in t and t["concentration"] for t in self.duration) else ""
+        conc = "(conc.)" if self.concentration else ""
         out = [f"L{self.level}", time, self.school, conc, self.range.get_glance_info()]
         return "\t".join(out)
 
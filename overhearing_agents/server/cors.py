@@ -0,0 +1,101 @@
+"""
+A minimal CORS middleware for the server's static allow-everything policy.
+
+It sends the same status, headers, and body as Starlette's ``CORSMiddleware(allow_origins=["*"],
+allow_credentials=True, allow_methods=["*"], allow_headers=["*"])``, but since the origin and headers always pass,
+it only has to check the requested method and the private-network flag, and it works on the raw header lists.
+"""
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# what allow_methods=["*"] expands to (starlette.middleware.cors.ALL_METHODS)
+ALLOWED_METHODS = (b"DELETE", b"GET", b"HEAD", b"OPTIONS", b"PATCH", b"POST", b"PUT", b"QUERY")
+PREFLIGHT_VARY = (
+    b"Origin, Access-Control-Request-Method, Access-Control-Request-Headers, Access-Control-Request-Private-Network"
+)
+PREFLIGHT_ALLOW_METHODS = b", ".join(ALLOWED_METHODS)
+
+
+def _set_header(headers: list[tuple[bytes, bytes]], key: bytes, value: bytes):
+    """Set a header the way MutableHeaders does: replace the first one with this key in place and drop the rest."""
+    indices = [idx for idx, (k, _) in enumerate(headers) if k == key]
+    if not indices:
+        headers.append((key, value))
+        return
+    headers[indices[0]] = (key, value)
+    for idx in reversed(indices[1:]):
+        del headers[idx]
+
+
+def _add_vary_origin(headers: list[tuple[bytes, bytes]]):
+    """Merge Origin into the response's Vary header(s)."""
+    _set_header(headers, b"vary", b", ".join([*(v for k, v in headers if k == b"vary"), b"Origin"]))
+
+
+class AllowAllCORSMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # like Headers.get, use the first of each
+        origin = None
+        requested_method = None
+        requested_headers = None
+        requested_private_network = None
+        for key, value in scope["headers"]:
+            if key == b"origin":
+                if origin is None:
+                    origin = value
+            elif key == b"access-control-request-method":
+                if requested_method is None:
+                    requested_method = value
+            elif key == b"access-control-request-headers":
+                if requested_headers is None:
+                    requested_headers = value
+            elif key == b"access-control-request-private-network":
+                if requested_private_network is None:
+                    requested_private_network = value
+
+        # preflight: answer it here without going through the app
+        # with credentials allowed, the origin has to be echoed back rather than "*"
+        if origin is not None and scope["method"] == "OPTIONS" and requested_method is not None:
+            headers = [
+                (b"vary", PREFLIGHT_VARY),
+                (b"access-control-allow-methods", PREFLIGHT_ALLOW_METHODS),
+                (b"access-control-max-age", b"600"),
+                (b"access-control-allow-credentials", b"true"),
+                (b"access-control-allow-origin", origin),
+            ]
+            if requested_headers is not None:
+                headers.append((b"access-control-allow-headers", requested_headers))
+            failures = []
+            if requested_method not in ALLOWED_METHODS:
+                failures.append(b"method")
+            if requested_private_network is not None:
+                failures.append(b"private-network")
+            if failures:
+                status, body = 400, b"Disallowed CORS " + b", ".join(failures)
+            else:
+                status, body = 200, b"OK"
+            headers.append((b"content-length", b"%d" % len(body)))
+            headers.append((b"content-type", b"text/plain; charset=utf-8"))
+            await send({"type": "http.response.start", "status": status, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        # simple/actual request: add the headers to the app's response
+        # the response depends on the origin, so caches need to know that even if there wasn't one
+        async def send_with_cors(message: Message):
+            if message["type"] == "http.response.start":
+                headers = message["headers"] = list(message.get("headers", ()))
+                if origin is not None:
+                    _set_header(headers, b"access-control-allow-origin", origin)
+                    _set_header(headers, b"access-control-allow-credentials", b"true")
+                _add_vary_origin(headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
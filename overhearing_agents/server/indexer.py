@@ -3,20 +3,41 @@ This module contains utilities for indexing a directory that might contain saves
 """
 
 import json
+import os
 from pathlib import Path
 from typing import Iterable
 
 from .models import SaveMeta
 
 
-def find_saves(fp: Path) -> Iterable[SaveMeta]:
-    """Recursively yield saves starting from a given root dir."""
-    state_fp = fp / "state.json"
-    event_fp = fp / "events.jsonl"
-    if state_fp.exists():
-        with open(state_fp, encoding="utf-8") as f:
-            data = json.load(f)
-            yield SaveMeta(
+def find_saves(fp: Path, cache: dict[Path, tuple[int, SaveMeta]] = None) -> Iterable[SaveMeta]:
+    """
+    Recursively yield saves starting from a given root dir.
+
+    :param cache: A mapping of state file path -> (mtime_ns, SaveMeta) from a previous index. Saves whose state file
+        hasn't been modified since are yielded from the cache rather than reread, and reread saves are added to it.
+    """
+    # one directory listing gets us both whether this is a save and the subdirs to recurse into, without a stat for
+    # each entry (saves can have a lot of audio files)
+    state_entry = None
+    subdirs = []
+    with os.scandir(fp) as it:
+        for entry in it:
+            if entry.name == "state.json" and entry.is_file():
+                state_entry = entry
+            elif entry.is_dir():
+                subdirs.append(Path(entry.path))
+
+    if state_entry is not None:
+        state_fp = fp / "state.json"
+        event_fp = fp / "events.jsonl"
+        mtime_ns = state_entry.stat().st_mtime_ns
+        if cache is not None and state_fp in cache and cache[state_fp][0] == mtime_ns:
+            yield cache[state_fp][1]
+        else:
+            with open(state_fp, encoding="utf-8") as f:
+                data = json.load(f)
+            save = SaveMeta(
                 grouping_prefix=list(fp.parent.parts),
                 save_dir=fp,
                 state_fp=state_fp,
@@ -26,9 +47,10 @@ def find_saves(fp: Path) -> Iterable[SaveMeta]:
                 last_modified=data["last_modified"],
                 n_events=data["n_events"],
             )
+            if cache is not None:
+                cache[state_fp] = (mtime_ns, save)
+            yield save
 
     # recurse
-    for subdir in fp.iterdir():
-        if not subdir.is_dir():
-            continue
-        yield from find_saves(subdir)
+    for subdir in subdirs:
+        yield from find_saves(subdir, cache)
@@ -5,6 +5,8 @@ from pydantic import BaseModel, SerializeAsAny
 from overhearing_agents.state import KaniState, Suggestion
 
 
+# these are only used as REST request/response bodies (websocket events are serialized directly), so they stay
+# pydantic models for FastAPI's validation and schema generation
 # ===== server -> client =====
 class SessionMeta(BaseModel):
     id: str
@@ -1,20 +1,22 @@
 import asyncio
-import json
+import functools
 import logging
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Annotated, Awaitable, Callable, Collection
+from typing import Annotated, Awaitable, Callable, Collection, Union
 
-from fastapi import Body, FastAPI, HTTPException, WebSocket, WebSocketDisconnect, WebSocketException
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+import aiofiles
+from fastapi import Body, FastAPI, HTTPException, Header, WebSocket, WebSocketDisconnect, WebSocketException
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from pydantic import Field, TypeAdapter
 
 from overhearing_agents import events
 from overhearing_agents.config import DEFAULT_LOG_DIR
 from overhearing_agents.events import Error, SendMessage
 from overhearing_agents.session import OverhearingAgentsSession
-from overhearing_agents.utils import read_jsonl
+from overhearing_agents.utils import _DYNAMIC_SUBCLASS_DESER_CONTEXT
+from .cors import AllowAllCORSMiddleware
 from .indexer import find_saves
 from .models import SaveMeta, SessionMeta, SessionState
 from .session_manager import SessionManager
@@ -22,6 +24,74 @@ from .session_manager import SessionManager
 VIZ_DIST = Path(__file__).parent / "viz_dist"
 log = logging.getLogger("server")
 
+SAVE_LIST_ADAPTER = TypeAdapter(list[SaveMeta])
+# (size of the DynamicSubclassDeser registry when it was built, adapter for every registered UserEvent subclass)
+_user_event_adapter: tuple[int, TypeAdapter] | None = None
+
+
+def validate_user_event_json(data: str | bytes) -> events.UserEvent:
+    """
+    Validate an incoming ws frame straight into the UserEvent subclass named by its type in one pass
+    (UserEvent.model_validate_json parses to a dict, then validates it again as the subclass).
+
+    The discriminated union is built from the DynamicSubclassDeser registry, and rebuilt whenever a new subclass has
+    been registered since, so subclasses defined in other modules (e.g. FoundryActionEvent) are always included.
+    """
+    global _user_event_adapter
+    registry = events.UserEvent._subclass_registry
+    if _user_event_adapter is None or _user_event_adapter[0] != len(registry):
+        subclasses = tuple(klass for klass in registry.values() if issubclass(klass, events.UserEvent))
+        adapter = TypeAdapter(Annotated[Union[subclasses], Field(discriminator="type")])
+        _user_event_adapter = (len(registry), adapter)
+    # the context tells DynamicSubclassDeser that the subclass has already been picked
+    return _user_event_adapter[1].validate_json(data, context=_DYNAMIC_SUBCLASS_DESER_CONTEXT)
+
+
+def session_state_response(manager: SessionManager) -> Response:
+    """
+    Serialize a session's state (which includes every kani's full chat history) once, rather than letting FastAPI dump,
+    revalidate, and then serialize it again.
+    """
+    return Response(manager.get_state_json(), media_type="application/json")
+
+
+async def stream_jsonl_as_array(fp: Path):
+    """Stream the lines of a JSONL file as a JSON array, without parsing and reserializing each line."""
+    async with aiofiles.open(fp, encoding="utf-8") as f:
+        yield "["
+        sep = ""
+        while lines := await f.readlines(65536):
+            chunk = []
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                chunk.append(sep)
+                chunk.append(line)
+                sep = ","
+            yield "".join(chunk)
+        yield "]"
+
+
+async def stream_file(fp: Path, chunk_size=65536):
+    """Stream the raw bytes of a file that might still be being appended to."""
+    async with aiofiles.open(fp, "rb") as f:
+        while chunk := await f.read(chunk_size):
+            yield chunk
+
+
+@functools.lru_cache(maxsize=4096)
+def resolve_static_path(save_dir: Path, fp: Path) -> Path | None:
+    """
+    Resolve a path relative to a save dir, or return None if it would escape the save dir.
+    Cached since resolving hits the filesystem and the same assets (e.g. audio clips) are requested over and over.
+    """
+    save_dir = save_dir.resolve()
+    static_path = save_dir.joinpath(fp).resolve()
+    if not static_path.is_relative_to(save_dir):
+        return None
+    return static_path
+
 
 class VizServer:
     def __init__(
@@ -39,6 +109,10 @@ class VizServer:
         # saves
         self.save_dirs = save_dirs
         self.saves: dict[str, SaveMeta] = {}
+        # state file path -> (mtime_ns, SaveMeta), so reindexing only rereads saves that changed
+        self._save_cache: dict[Path, tuple[int, SaveMeta]] = {}
+        # the serialized body of GET /api/saves, rebuilt on the next request after the saves change
+        self._saves_payload: bytes | None = None
 
         # interactive session states
         self.interactive_sessions: dict[str, SessionManager] = {}
@@ -48,15 +122,25 @@ class VizServer:
         self.setup_app()
 
     # ==== utils ====
-    async def reindex_saves(self):
-        """Asynchronously walk the save_dirs and update self.saves."""
+    async def reindex_saves(self, force=False):
+        """
+        Asynchronously walk the save_dirs and update self.saves.
+
+        :param force: Reread every save's state file, even if it hasn't been modified since the last index.
+        """
 
         def _index():
+            if force:
+                self._save_cache.clear()
             new_saves = {}
             for root in self.save_dirs:
-                for save in find_saves(root):
+                for save in find_saves(root, self._save_cache):
                     new_saves[save.id] = save
+            # forget saves that no longer exist
+            seen = {save.state_fp for save in new_saves.values()}
+            self._save_cache = {k: v for k, v in self._save_cache.items() if k in seen}
             self.saves = new_saves
+            self.invalidate_saves_payload()
             log.info(f"Finished indexing saves - {len(self.saves)} files loaded.")
 
         # most of the time is spent in IO with the filesystem so we can thread this
@@ -66,8 +150,18 @@ class VizServer:
         """Return a new OverhearingAgentsSession instance given the server config."""
         return await self.session_factory(**override_kwargs)
 
+    def invalidate_saves_payload(self):
+        """Call this whenever a save is added, removed, or updated so that the next save list is rebuilt."""
+        self._saves_payload = None
+
     def serve(self, host="127.0.0.1", port=8000, **kwargs):
-        """Serve this server at the given IP and port. Blocks until interrupted."""
+        """
+        Serve this server at the given IP and port. Blocks until interrupted.
+
+        uvicorn's default ``loop="auto"`` and ``http="auto"`` use uvloop and httptools (installed with
+        ``uvicorn[standard]``) when they're available, and fall back to asyncio and h11 otherwise (e.g. uvloop on
+        Windows). Any *kwargs* are passed to ``uvicorn.run``.
+        """
         import uvicorn
 
         uvicorn.run(self.fastapi, host=host, port=port, **kwargs)
@@ -77,22 +171,27 @@ class VizServer:
     async def _lifespan(self, _: FastAPI):
         _ = asyncio.create_task(self.reindex_saves())
         yield
-        await asyncio.gather(*(session.close() for session in self.interactive_sessions.values()))
+        # close every session even if one of them fails, and report each failure
+        managers = list(self.interactive_sessions.values())
+        results = await asyncio.gather(*(manager.close() for manager in managers), return_exceptions=True)
+        for manager, result in zip(managers, results):
+            if isinstance(result, BaseException):
+                log.error(f"Error closing session {manager.session.session_id}:", exc_info=result)
 
     def setup_app(self):
         """Set up the FastAPI routes, middleware, etc."""
         # cors middleware
         # noinspection PyTypeChecker
-        self.fastapi.add_middleware(
-            CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"]
-        )
+        self.fastapi.add_middleware(AllowAllCORSMiddleware)
 
         # ===== routes =====
         # ---- saves ----
-        @self.fastapi.get("/api/saves")
-        async def list_saves() -> list[SaveMeta]:
+        @self.fastapi.get("/api/saves", response_model=list[SaveMeta])
+        async def list_saves():
             """List all the saves the server is configured to see."""
-            return list(self.saves.values())
+            if self._saves_payload is None:
+                self._saves_payload = SAVE_LIST_ADAPTER.dump_json(list(self.saves.values()))
+            return Response(self._saves_payload, media_type="application/json")
 
         @self.fastapi.get("/api/saves/{save_id}")
         async def get_save_state(save_id: str):
@@ -100,16 +199,21 @@ class VizServer:
             if save_id not in self.saves:
                 raise HTTPException(404, "save not found")
             save = self.saves[save_id]
-            with open(save.state_fp) as f:
-                return json.load(f)
+            # the state file is already the JSON we want to send, so don't parse and reencode it
+            return FileResponse(save.state_fp, media_type="application/json")
 
         @self.fastapi.get("/api/saves/{save_id}/events")
-        async def get_save_events(save_id: str):
-            """Get all events in a given save (not interactive - this just loads from file)."""
+        async def get_save_events(save_id: str, accept: Annotated[str | None, Header()] = None):
+            """
+            Get all events in a given save (not interactive - this just loads from file).
+            Returns a JSON array, or the raw JSONL if the client accepts ``application/x-ndjson``.
+            """
             if save_id not in self.saves:
                 raise HTTPException(404, "save not found")
             save = self.saves[save_id]
-            return list(read_jsonl(save.event_fp))
+            if accept and "application/x-ndjson" in accept:
+                return StreamingResponse(stream_file(save.event_fp), media_type="application/x-ndjson")
+            return StreamingResponse(stream_jsonl_as_array(save.event_fp), media_type="application/json")
 
         @self.fastapi.get("/api/saves/{save_id}/static/{fp:path}")
         async def get_save_static_file(save_id: str, fp: Path):
@@ -117,9 +221,8 @@ class VizServer:
             if save_id not in self.saves:
                 raise HTTPException(404, "save not found")
             save = self.saves[save_id]
-            save_dir = save.save_dir.resolve()
-            static_path = save_dir.joinpath(fp).resolve()
-            if not static_path.is_relative_to(save_dir):
+            static_path = resolve_static_path(save.save_dir, fp)
+            if static_path is None:
                 raise HTTPException(400, "invalid path")
             return FileResponse(static_path)
 
@@ -136,6 +239,8 @@ class VizServer:
                 save.state_fp.unlink(missing_ok=True)
                 save.event_fp.unlink(missing_ok=True)
                 del self.saves[save_id]
+                self.invalidate_saves_payload()
+                resolve_static_path.cache_clear()
                 save.state_fp.parent.rmdir()
             except FileNotFoundError:
                 raise HTTPException(404, "save not found")
@@ -150,8 +255,8 @@ class VizServer:
             """List the interactive sessions currently loaded by the server."""
             return [manager.get_session_meta() for manager in self.interactive_sessions.values()]
 
-        @self.fastapi.post("/api/states")
-        async def create_state_interactive(start_content: Annotated[str, Body(embed=True)] = None) -> SessionState:
+        @self.fastapi.post("/api/states", response_model=SessionState)
+        async def create_state_interactive(start_content: Annotated[str, Body(embed=True)] = None) -> Response:
             """Create a fresh new interactive session, optionally with a first user message.
             This will also create a new save.
             """
@@ -161,18 +266,19 @@ class VizServer:
             manager = SessionManager(self, oa_session)
             self.interactive_sessions[oa_session.session_id] = manager
             self.saves[oa_session.session_id] = manager.get_save_meta()
+            self.invalidate_saves_payload()
             await manager.start()
             if start_content:
                 await manager.event_queue.put(SendMessage(content=start_content))
-            return manager.get_state()
+            return session_state_response(manager)
 
-        @self.fastapi.get("/api/states/{session_id}")
-        async def get_state_interactive(session_id: str) -> SessionState:
+        @self.fastapi.get("/api/states/{session_id}", response_model=SessionState)
+        async def get_state_interactive(session_id: str) -> Response:
             """Get the state of a specific interactive session loaded in the server."""
             if session_id not in self.interactive_sessions:
                 raise HTTPException(404, "session is not initialized - load from archive or create new first")
             manager = self.interactive_sessions[session_id]
-            return manager.get_state()
+            return session_state_response(manager)
 
         @self.fastapi.websocket("/api/ws/{session_id}")
         async def ws_interactive(websocket: WebSocket, session_id: str):
@@ -188,14 +294,15 @@ class VizServer:
                 try:
                     data = await websocket.receive_text()
                     log.debug(f"got data from ws for session {session_id}: {data}")
-                    event = events.UserEvent.model_validate_json(data)
-                    await manager.event_queue.put(event)
+                    event = validate_user_event_json(data)
+                    await manager.put_event(event)
                 except WebSocketDisconnect:
                     manager.disconnect(websocket)
                     break
                 except Exception as e:
                     log.exception(f"Exception on ws event in session {session_id}:")
-                    await websocket.send_text(Error.from_exc(e).model_dump_json())
+                    # send it through the connection's writer so it doesn't interleave with a broadcast
+                    manager.send(websocket, Error.from_exc(e).json_dump)
 
         # debug - todo don't deploy me to production!
         @self.fastapi.get("/api/debug/force_reconnect")
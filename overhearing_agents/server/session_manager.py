@@ -1,4 +1,6 @@
 import asyncio
+import contextlib
+import logging
 from typing import TYPE_CHECKING
 
 from fastapi import WebSocket
@@ -9,6 +11,17 @@ from .models import SaveMeta, SessionMeta, SessionState
 if TYPE_CHECKING:
     from .server import VizServer
 
+# how long to wait for a single client to accept an event before dropping it
+WS_SEND_TIMEOUT = 5
+# the most events to buffer for a single client before dropping it
+WS_SEND_QUEUE_MAXSIZE = 1024
+# the most user events to hold while the session is busy with a round - the mic streams ~6 audio deltas/sec, so this
+# is a few minutes of audio
+EVENT_QUEUE_MAXSIZE = 1024
+# how long a client's event can wait for room in a full queue before it's rejected
+EVENT_QUEUE_PUT_TIMEOUT = 5
+log = logging.getLogger(__name__)
+
 
 class SessionManager:
     """Responsible for a single session and all connections to it."""
@@ -18,8 +31,23 @@ class SessionManager:
         self.session = session
         self.session.add_listener(self.on_event)
         self.task = None
-        self.event_queue = asyncio.Queue[events.UserEventT]()
-        self.active_connections: list[WebSocket] = []
+        self.event_queue = asyncio.Queue[events.UserEventT](maxsize=EVENT_QUEUE_MAXSIZE)
+        # each connection has its own queue of serialized events and a task writing them out
+        self.active_connections: dict[WebSocket, tuple[asyncio.Queue[str], asyncio.Task]] = {}
+        self._background_tasks: set[asyncio.Task] = set()
+        # the JSON of each suggestion in the session's suggestion history so far, in order
+        self._suggestion_json: list[str] = []
+        # the paths don't change over the session's lifetime, so build this once and keep its counters up to date
+        self._save_meta = SaveMeta(
+            id=self.session.session_id,
+            created=self.session.logger.created,
+            last_modified=self.session.logger.last_modified,
+            n_events=self.session.logger.event_count.total(),
+            grouping_prefix=self.session.logger.log_dir.parent.parts,
+            save_dir=self.session.logger.log_dir,
+            state_fp=self.session.logger.state_path,
+            event_fp=self.session.logger.aof_path,
+        )
 
     # ==== lifecycle ====
     async def start(self):
@@ -30,12 +58,18 @@ class SessionManager:
     async def close(self):
         if self.task is not None:
             self.task.cancel()
+        # closing the session broadcasts its SessionClose, so let each writer send that before disconnecting it
         await self.session.close()
+        connections = list(self.active_connections.items())
+        await asyncio.gather(*(self._drain(queue) for _, (queue, _) in connections))
+        for websocket, _ in connections:
+            self.disconnect(websocket)
 
     # ==== state ====
     def get_state(self) -> SessionState:
         kanis = [ai.get_save_state() for ai in self.session.kanis.values()]
-        return SessionState(
+        # everything here is already a valid model/value of the right type, so skip revalidating it
+        return SessionState.model_construct(
             id=self.session.session_id,
             created=self.session.logger.created,
             last_modified=self.session.logger.last_modified,
@@ -44,8 +78,23 @@ class SessionManager:
             suggestion_history=self.session.suggestion_history,
         )
 
+    def get_state_json(self) -> str:
+        """
+        The JSON serialization of get_state(). The suggestion history only grows, and suggestions don't change once
+        they're made, so each one is serialized once and spliced into the rest of the state.
+        """
+        history = self.session.suggestion_history
+        if len(self._suggestion_json) > len(history):
+            self._suggestion_json.clear()
+        for suggestion in history[len(self._suggestion_json) :]:
+            self._suggestion_json.append(suggestion.model_dump_json())
+
+        state = self.get_state().model_dump_json(exclude={"suggestion_history"})
+        # suggestion_history is the last field, so it goes right before the closing brace
+        return f'{state[:-1]},"suggestion_history":[{",".join(self._suggestion_json)}]}}'
+
     def get_session_meta(self) -> SessionMeta:
-        return SessionMeta(
+        return SessionMeta.model_construct(
             id=self.session.session_id,
             created=self.session.logger.created,
             last_modified=self.session.logger.last_modified,
@@ -53,34 +102,97 @@ class SessionManager:
         )
 
     def get_save_meta(self) -> SaveMeta:
-        return SaveMeta(
-            id=self.session.session_id,
-            created=self.session.logger.created,
-            last_modified=self.session.logger.last_modified,
-            n_events=self.session.logger.event_count.total(),
-            grouping_prefix=self.session.logger.log_dir.parent.parts,
-            save_dir=self.session.logger.log_dir,
-            state_fp=self.session.logger.state_path,
-            event_fp=self.session.logger.aof_path,
-        )
+        self._save_meta.last_modified = self.session.logger.last_modified
+        self._save_meta.n_events = self.session.logger.event_count.total()
+        return self._save_meta
+
+    # ==== events ====
+    async def put_event(self, event: events.UserEvent):
+        """
+        Queue a user event for the session. If the queue stays full (the session is stuck, or a client is flooding
+        it), raise a TimeoutError rather than buffering without bound.
+        """
+        try:
+            await asyncio.wait_for(self.event_queue.put(event), timeout=EVENT_QUEUE_PUT_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise asyncio.TimeoutError(
+                f"The session is not keeping up with incoming events, dropped a {event.type} event"
+            ) from None
 
     # ==== ws ====
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        queue = asyncio.Queue[str](maxsize=WS_SEND_QUEUE_MAXSIZE)
+        task = asyncio.create_task(self._writer(websocket, queue))
+        self.active_connections[websocket] = (queue, task)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        if websocket not in self.active_connections:
+            return
+        _, task = self.active_connections.pop(websocket)
+        if task is not asyncio.current_task():
+            task.cancel()
 
-    async def broadcast(self, data: str):
-        await asyncio.gather(
-            *(connection.send_text(data) for connection in self.active_connections), return_exceptions=True
-        )
+    def send(self, websocket: WebSocket, data: str):
+        """Queue the data to be sent to a single connection, after everything already queued for it."""
+        if websocket not in self.active_connections:
+            return
+        queue, _ = self.active_connections[websocket]
+        try:
+            queue.put_nowait(data)
+        except asyncio.QueueFull:
+            # dropping events would desync the client's state, so drop the client instead
+            log.warning(f"Too many unsent events to a websocket in session {self.session.session_id}, disconnecting it")
+            self._drop(websocket)
+
+    def broadcast(self, data: str):
+        """Queue the data to be sent to each connection. Doesn't wait for any of them to send it."""
+        for websocket in list(self.active_connections):
+            self.send(websocket, data)
+
+    async def _writer(self, websocket: WebSocket, queue: asyncio.Queue[str]):
+        """Send the queued events to a single connection in order, so a slow client only holds up itself."""
+        while True:
+            data = await queue.get()
+            try:
+                await asyncio.wait_for(websocket.send_text(data), timeout=WS_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                log.warning(f"Timed out sending to a websocket in session {self.session.session_id}, disconnecting it")
+                self._drop(websocket)
+                return
+            except Exception:
+                pass
+            finally:
+                queue.task_done()
+
+    def _drop(self, websocket: WebSocket):
+        """Disconnect a client that can't keep up and close it in the background."""
+        self.disconnect(websocket)
+        # 1012 tells the viz client to reconnect
+        task = asyncio.create_task(self._close(websocket, 1012))
+        # keep a reference so the task isn't garbage collected before it finishes
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    @staticmethod
+    async def _drain(queue: asyncio.Queue[str]):
+        """Wait for a connection's writer to send everything queued for it, up to the send timeout."""
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(queue.join(), timeout=WS_SEND_TIMEOUT)
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int):
+        with contextlib.suppress(Exception):
+            await asyncio.wait_for(websocket.close(code), timeout=WS_SEND_TIMEOUT)
 
     async def on_event(self, event: events.BaseEvent):
         if isinstance(event, events.UserEvent):
             return
-        await self.broadcast(event.model_dump_json())
+        # don't serialize the event if nobody's watching (the logger doesn't need it for events with audio)
+        if self.active_connections:
+            self.broadcast(event.json_dump)
         # update the server save info on each RoundComplete
+        # still reassign it (it's only a dict set) since a reindex replaces the server's saves with what's on disk
         if isinstance(event, events.RoundComplete):
             self.server.saves[self.session.session_id] = self.get_save_meta()
+            self.server.invalidate_saves_payload()
@@ -1,12 +1,12 @@
 import asyncio
 import base64
+import collections
 import logging
 import time
 import uuid
 from collections.abc import AsyncIterable
 from pathlib import Path
 from typing import Any, Awaitable, Callable
-from weakref import WeakValueDictionary
 
 from kani import ChatRole
 from kani.ext.realtime.interop import AudioPart
@@ -18,6 +18,10 @@ from .state import Suggestion
 from .utils import ainput, print_event, round_events
 
 log = logging.getLogger(__name__)
+# streamed input audio is 24kHz mono 16-bit PCM (the OpenAI realtime API's pcm16 format)
+AUDIO_BYTES_PER_SEC = 24000 * 2
+# the most queued events to hand to the listeners at once
+DISPATCH_BATCH_SIZE = 64
 
 
 class OverhearingAgentsSession:
@@ -46,31 +50,45 @@ class OverhearingAgentsSession:
         """
         # internals
         self._init_lock = asyncio.Lock()
+        self._initialized = False
 
         # config
         self.max_function_rounds = max_function_rounds
 
         # events
-        self.listeners = []
+        # listener -> whether it only wants loggable events, in the order they were added - keyed by the callback
+        # itself rather than its id(), since bound methods like q.put are a new object (with the same hash) each time
+        # they're accessed
+        self.listeners: dict[Callable[[events.BaseEvent], Awaitable[Any]], bool] = {}
+        # the number of listeners that want unlogged events too (e.g. stream deltas)
+        self._verbose_listener_count = 0
         self.event_queue = asyncio.Queue()
         self.dispatch_task = None
         # state
         self.session_id = session_id or f"{int(time.time())}-{uuid.uuid4()}"
         # logging
         self.logger = EventLogger(self, self.session_id, log_dir=log_dir, clear_existing_log=clear_existing_log)
-        self.add_listener(self.logger.log_event)
+        self.add_listener(self.logger.log_event, loggable_only=True)
         # kanis
         self.root_kani = root_kani
-        self.kanis = WeakValueDictionary()
+        # every kani here is kept alive by the session anyway (only the root kani joins, and any children would be
+        # held by their parent's children), so there's no need for weak references
+        self.kanis: dict[str, BaseKani] = {}
 
         # overhearing_agents state
         # adding new synced stateful attrs here? make sure to also add it to
         # server/models, server/session_manager, and eventlogger
+        # this is the full history (it's saved to state.json and synced to clients), so don't make it a bounded deque
+        # - appends are amortized O(1) anyway
         self.suggestion_history: list[Suggestion] = []
 
     async def ensure_init(self):
         """Called at least once before any messaging happens. Used to do async init. Must be idempotent."""
+        if self._initialized:
+            return self.root_kani
         async with self._init_lock:  # lock in case of parallel calls - no double creation
+            if self._initialized:
+                return self.root_kani
             if self.dispatch_task is None:
                 self.dispatch_task = asyncio.create_task(self._dispatch_task(), name=f"dispatch-{self.session_id}")
             if self.root_kani.pa_session is None:
@@ -78,12 +96,25 @@ class OverhearingAgentsSession:
             elif self.root_kani.pa_session is not self:
                 raise ValueError("Kanis cannot be reused in multiple sessions!")
             await self.root_kani.init()
+            self._initialized = True
         return self.root_kani
 
     # === entrypoints ===
     # --- non-realtime ---
-    async def chat_from_queue(self, q: asyncio.Queue[events.UserEventT], streaming_audio_chunk_duration=5.0):
-        """Get chat messages from a provided queue. Used internally in the visualization server."""
+    async def chat_from_queue(
+        self,
+        q: asyncio.Queue[events.UserEventT],
+        streaming_audio_chunk_duration=5.0,
+        max_streaming_audio_chunk_duration=60.0,
+    ):
+        """
+        Get chat messages from a provided queue. Used internally in the visualization server.
+
+        :param streaming_audio_chunk_duration: Send streamed input audio once at least this many seconds have
+            accumulated and no more events are waiting in the queue.
+        :param max_streaming_audio_chunk_duration: Send streamed input audio once this many seconds have accumulated,
+            even if more events are waiting (e.g. a backlog from a long round).
+        """
         await self.ensure_init()
 
         # if we're using a realtime kani, make sure we log the events
@@ -94,9 +125,11 @@ class OverhearingAgentsSession:
             if self.logger.log_realtime_event not in self.root_kani.session.listeners:
                 self.root_kani.session.add_listener(self.logger.log_realtime_event)
 
-        # set up a b64 buffer for streaming input
-        audio_buffer = bytearray()
-        streaming_chunk_duration_b64_len = streaming_audio_chunk_duration * 48000  # 48kB bytes = 1 sec
+        # set up a buffer for streaming input: the decoded chunks, joined and encoded once when we send them
+        audio_chunks: list[bytes] = []
+        audio_buffer_len = 0
+        streaming_chunk_duration_bytes = int(streaming_audio_chunk_duration * AUDIO_BYTES_PER_SEC)
+        max_streaming_chunk_duration_bytes = int(max_streaming_audio_chunk_duration * AUDIO_BYTES_PER_SEC)
 
         # main loop
         try:
@@ -118,16 +151,22 @@ class OverhearingAgentsSession:
                             if text_suffix:
                                 query.append(text_suffix)
                         case events.InputAudioDelta(data_b64=audio_b64):
-                            audio_buffer.extend(base64.b64decode(audio_b64))
-                            if len(audio_buffer) >= streaming_chunk_duration_b64_len and q.empty():
+                            chunk = base64.b64decode(audio_b64)
+                            audio_chunks.append(chunk)
+                            audio_buffer_len += len(chunk)
+                            # wait for the queue to empty so a backlog of audio is sent together, up to a limit
+                            if audio_buffer_len >= streaming_chunk_duration_bytes and (
+                                q.empty() or audio_buffer_len >= max_streaming_chunk_duration_bytes
+                            ):
                                 query = [
                                     AudioPart(
                                         oai_type="input_audio",
                                         transcript=None,
-                                        audio_b64=base64.b64encode(audio_buffer).decode(),
+                                        audio_b64=base64.b64encode(b"".join(audio_chunks)).decode(),
                                     )
                                 ]
-                                audio_buffer.clear()
+                                audio_chunks.clear()
+                                audio_buffer_len = 0
                             else:
                                 continue
                         case e:
@@ -200,21 +239,26 @@ class OverhearingAgentsSession:
         await self.ensure_init()
 
         in_q = asyncio.Queue()
-        out_q = asyncio.Queue()
         chat_task = asyncio.create_task(self.chat_from_queue(in_q, streaming_audio_chunk_duration=send_audio_every))
-        self.add_listener(out_q.put)
+        # we only ever check for new events between audio chunks, so just collect them rather than queueing them
+        out_events = collections.deque()
+
+        async def collect_event(e: events.BaseEvent):
+            out_events.append(e)
+
+        self.add_listener(collect_event, loggable_only=only_loggable)
 
         try:
             async for data in audio_stream:
-                await in_q.put(events.InputAudioDelta(data_b64=base64.b64encode(data).decode()))
-                while not out_q.empty():
-                    event = await out_q.get()
+                in_q.put_nowait(events.InputAudioDelta(data_b64=base64.b64encode(data).decode()))
+                while out_events:
+                    event = out_events.popleft()
                     if event.__log_event__ or not only_loggable:
                         yield event
                     if isinstance(event, events.Error):
                         raise event.exc
         finally:
-            self.remove_listener(out_q.put)
+            self.remove_listener(collect_event)
             chat_task.cancel()
 
     async def chat_in_terminal_audio(self, mic_id: int, send_audio_every=5.0):
@@ -327,16 +371,24 @@ class OverhearingAgentsSession:
             self.remove_listener(handle_event)
 
     # === events ===
-    def add_listener(self, callback: Callable[[events.BaseEvent], Awaitable[Any]]):
+    def add_listener(self, callback: Callable[[events.BaseEvent], Awaitable[Any]], *, loggable_only=False):
         """
         Add a listener which is called for every event dispatched by the system.
         The listener must be an asynchronous function that takes in an event in a single argument.
+
+        :param loggable_only: Whether the listener ignores events that aren't logged (e.g. stream deltas). If every
+            listener does, those events aren't dispatched at all. The listener should still check
+            ``event.__log_event__`` itself, since it may receive them when other listeners want them.
         """
-        self.listeners.append(callback)
+        self.remove_listener(callback)
+        self.listeners[callback] = loggable_only
+        if not loggable_only:
+            self._verbose_listener_count += 1
 
     def remove_listener(self, callback):
-        """Remove a listener added by :meth:`add_listener`."""
-        self.listeners.remove(callback)
+        """Remove a listener added by :meth:`add_listener`. Does nothing if it's not a listener."""
+        if self.listeners.pop(callback, True) is False:
+            self._verbose_listener_count -= 1
 
     async def wait_for(
         self,
@@ -353,6 +405,9 @@ class OverhearingAgentsSession:
         future = asyncio.get_running_loop().create_future()
 
         async def waiter(e: events.BaseEvent):
+            # more events can be dispatched before the waiting task wakes up and removes this listener
+            if future.done():
+                return
             if e.type == event_type and (predicate is None or predicate(e)):
                 future.set_result(e)
             # raise an applicable Error
@@ -367,27 +422,48 @@ class OverhearingAgentsSession:
 
     async def _dispatch_task(self):
         while True:
-            event = await self.event_queue.get()
+            batch = [await self.event_queue.get()]
+            # if events have backed up, take the rest too so that each listener gets one task for all of them
+            while len(batch) < DISPATCH_BATCH_SIZE:
+                try:
+                    batch.append(self.event_queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
             # noinspection PyBroadException
             try:
-                # get listeners, call them
-                results = await asyncio.gather(
-                    *(callback(event) for callback in self.listeners), return_exceptions=True
-                )
-                # log exceptions
-                for r in results:
-                    if isinstance(r, BaseException):
-                        log.exception("Exception in event dispatch:", exc_info=r)
+                # get listeners, call them (snapshot them, so listeners can add or remove themselves)
+                listeners = tuple(self.listeners)
+                # usually the only listener is the logger, which doesn't need a task of its own
+                if len(listeners) == 1:
+                    await self._call_listener(listeners[0], batch)
+                elif listeners:
+                    await asyncio.gather(*(self._call_listener(callback, batch) for callback in listeners))
             except asyncio.CancelledError:
                 raise
             except Exception:
                 log.exception("Exception when dispatching event:")
             finally:
-                self.event_queue.task_done()
+                for _ in batch:
+                    self.event_queue.task_done()
+
+    @staticmethod
+    async def _call_listener(callback: Callable[[events.BaseEvent], Awaitable[Any]], batch: list[events.BaseEvent]):
+        """Call a listener with each event in order. An exception for one event doesn't stop the rest."""
+        for event in batch:
+            # noinspection PyBroadException
+            try:
+                await callback(event)
+            except Exception:
+                log.exception("Exception in event dispatch:")
 
     def dispatch(self, event: events.BaseEvent):
         """Dispatch an event to all listeners.
         Technically this just adds it to a queue and then an async background task dispatches it."""
+        if not self.listeners:
+            return
+        # don't queue unlogged events (e.g. stream deltas) if no listener wants them
+        if not event.__log_event__ and not self._verbose_listener_count:
+            return
         self.event_queue.put_nowait(event)
 
     async def drain(self):
@@ -448,7 +524,7 @@ class SessionChatManager:
         from the root, filter for `events.RootMessage`.
         """
         async with round_events(self.pa_session, only_loggable=only_loggable, autoraise=self.autoraise) as rnd:
-            await self.in_q.put(events.SendMessage(content=query))
+            self.in_q.put_nowait(events.SendMessage(content=query))
             async for event in rnd:
                 yield event
 
@@ -459,6 +535,6 @@ class SessionChatManager:
         Yields all loggable events from the app (i.e. no stream deltas) during the query.
         """
         async with round_events(self.pa_session, only_loggable=only_loggable, autoraise=self.autoraise) as rnd:
-            await self.in_q.put(events.SendAudioMessage(data_b64=base64.b64encode(audio).decode()))
+            self.in_q.put_nowait(events.SendAudioMessage(data_b64=base64.b64encode(audio).decode()))
             async for event in rnd:
                 yield event
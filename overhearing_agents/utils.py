@@ -22,13 +22,18 @@ def create_kani_id() -> str:
     return str(uuid.uuid4())
 
 
-def batched(iterable: Iterable[T], n: int) -> Iterable[tuple[T, ...]]:
-    # batched('ABCDEFG', 3) --> ABC DEF G
-    if n < 1:
-        raise ValueError("n must be at least one")
-    it = iter(iterable)
-    while batch := tuple(itertools.islice(it, n)):
-        yield batch
+if sys.version_info >= (3, 12):
+    # implemented in C, with the same behaviour as the fallback below
+    batched = itertools.batched
+else:
+
+    def batched(iterable: Iterable[T], n: int) -> Iterable[tuple[T, ...]]:
+        # batched('ABCDEFG', 3) --> ABC DEF G
+        if n < 1:
+            raise ValueError("n must be at least one")
+        it = iter(iterable)
+        while batch := tuple(itertools.islice(it, n)):
+            yield batch
 
 
 def read_jsonl(fp) -> Iterable[dict]:
@@ -70,15 +75,23 @@ async def round_events(session, only_loggable=True, autoraise=True):
     :param autoraise: Whether to raise exceptions from the chat loop in the calling scope.
     """
     # register a new listener which passes events into a local queue
+    # (Error and RoundComplete are loggable, so they always make it through)
     q = asyncio.Queue()
-    session.add_listener(q.put)
+    if only_loggable:
+
+        async def listener(e: events.BaseEvent):
+            if e.__log_event__:
+                q.put_nowait(e)
+
+    else:
+        listener = q.put
+    session.add_listener(listener, loggable_only=only_loggable)
 
     async def generator():
         # yield from the q until we get a RoundComplete
         while True:
             event = await q.get()
-            if event.__log_event__ or not only_loggable:
-                yield event
+            yield event
             if autoraise and isinstance(event, events.Error):
                 raise event.exc
             if event.type == "round_complete":
@@ -87,7 +100,7 @@ async def round_events(session, only_loggable=True, autoraise=True):
     try:
         yield generator()
     finally:
-        session.remove_listener(q.put)
+        session.remove_listener(listener)
 
 
 def print_event(event, print_stream=True, print_user=False):
@@ -124,6 +137,10 @@ def get_chat_history_audio_len(msgs: list[ChatMessage]) -> float:
     return duration
 
 
+# passed to the subclass' validator so that it validates the data itself rather than dispatching again
+_DYNAMIC_SUBCLASS_DESER_CONTEXT = {"_dynamic_subclass_deser_seen": True}
+
+
 class DynamicSubclassDeser(BaseModel):
     # ==== serdes ====
     __discriminator_attr__: ClassVar[str]
@@ -158,14 +175,14 @@ class DynamicSubclassDeser(BaseModel):
         if isinstance(info.context, dict) and "_dynamic_subclass_deser_seen" in info.context:
             return nxt(v)
 
-        if isinstance(v, dict) and cls.__discriminator_attr__ in v:
-            type_key = v[cls.__discriminator_attr__]
-            try:
-                klass = cls._subclass_registry[type_key]
-            except KeyError:
+        discriminator_attr = cls.__discriminator_attr__
+        if isinstance(v, dict) and discriminator_attr in v:
+            type_key = v[discriminator_attr]
+            klass = cls._subclass_registry.get(type_key)
+            if klass is None:
                 raise ValueError(
                     f"Attempted to deserialize a {type(cls).__name__} with type {type_key!r}, but the type is not"
                     " defined."
-                ) from None
-            return klass.model_validate(v, context={"_dynamic_subclass_deser_seen": True})
+                )
+            return klass.model_validate(v, context=_DYNAMIC_SUBCLASS_DESER_CONTEXT)
         return nxt(v)
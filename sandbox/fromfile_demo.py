@@ -1,24 +1,24 @@
 import asyncio
+import contextlib
 import logging
 import random
-import time
 from pathlib import Path
 
 import easyaudiostream
 
-from experiments.models import OverhearingKaniRealtime
-from experiments.prompts import read_prompt
+from experiments.models import connect_realtime_kani
 from experiments.utils import audio_chunks_from_file
+from overhearing_agents import events
 from overhearing_agents.session import OverhearingAgentsSession
 from overhearing_agents.utils import print_event
 
-AGENT_INSTRUCTIONS = read_prompt("realtime_tom_0shot_audio.md")
+# silence played to init the playback before streaming a file to the server
+PRIMING_SILENCE = bytes(96000)
 
 
 async def main(fp):
-    ai = OverhearingKaniRealtime()
+    ai = await connect_realtime_kani()
     app = OverhearingAgentsSession(ai)
-    await ai.connect(instructions=AGENT_INSTRUCTIONS, modalities=["text"])
     async with app.chat_session() as s:
         async for chunk, start, end in audio_chunks_from_file(fp, yield_every=5):
             print(f"[{start} -> {end}]")
@@ -32,8 +32,7 @@ def listen_along_with_server(fp, *, random_seek=False, seek_to=None):
     active_tasks = set()
 
     async def create_session():
-        ai = OverhearingKaniRealtime(realtime_reconnect_reupload_secs=180)
-        await ai.connect(instructions=AGENT_INSTRUCTIONS, modalities=["text"])
+        ai = await connect_realtime_kani(realtime_reconnect_reupload_secs=180)
         app = OverhearingAgentsSession(ai)
 
         async def _sender_task(app):
@@ -42,20 +41,33 @@ def listen_along_with_server(fp, *, random_seek=False, seek_to=None):
             send_audio_every = 5
 
             # hack: play 1s of silence to init the playback, and wait
-            easyaudiostream.play_raw_audio(b"\0\0" * 48000)
+            easyaudiostream.play_raw_audio(PRIMING_SILENCE)
             await asyncio.sleep(3)
 
             async def chunk_stream():
+                # pace against absolute deadlines so that time spent outside the sleep doesn't accumulate as drift
+                loop = asyncio.get_running_loop()
+                next_deadline = None
                 async for chunk, start, end in audio_chunks_from_file(
                     fp, yield_every=yield_every, random_seek=random_seek, seek_to=seek_to
                 ):
-                    last_yield = time.perf_counter()
+                    # start the clock at the first chunk, once the file has loaded
+                    if next_deadline is None:
+                        next_deadline = loop.time()
+                    next_deadline += yield_every
                     easyaudiostream.play_raw_audio(chunk)
                     yield chunk
-                    await asyncio.sleep(max(last_yield + yield_every - time.perf_counter() - 0.005, 0))
-
-            async for event in app.stream_audio(chunk_stream(), only_loggable=False, send_audio_every=send_audio_every):
-                print_event(event)
+                    delay = next_deadline - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+            stream = app.stream_audio(chunk_stream(), only_loggable=False, send_audio_every=send_audio_every)
+            async with contextlib.aclosing(stream):
+                async for event in stream:
+                    print_event(event)
+                    # stop streaming once the server closes the session (e.g. it was deleted)
+                    if isinstance(event, events.SessionClose):
+                        break
 
         task = asyncio.create_task(_sender_task(app))
         active_tasks.add(task)
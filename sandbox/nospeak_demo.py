@@ -2,20 +2,16 @@ import asyncio
 
 from easyaudiostream import list_mics
 
-from experiments.models import OverhearingKaniRealtime
-from experiments.prompts import read_prompt
+from experiments.models import connect_realtime_kani
 from overhearing_agents.session import OverhearingAgentsSession
 
-AGENT_INSTRUCTIONS = read_prompt("realtime_tom_0shot_audio.md")
-
 # engine = OpenAIAudioEngine(model="gpt-4o-audio-preview", modalities=["text"])
-# ai = OverhearingKani(engine, system_prompt=AGENT_INSTRUCTIONS)
-ai = OverhearingKaniRealtime()  # the realtime API is like 80% cheaper
+# ai = OverhearingKani(engine, system_prompt=AUDIO_SYSTEM_PROMPT)
 
 
 async def main(mic_id: int):
+    ai = await connect_realtime_kani()  # the realtime API is like 80% cheaper
     app = OverhearingAgentsSession(ai)
-    await ai.connect(instructions=AGENT_INSTRUCTIONS, modalities=["text"])
     await app.chat_in_terminal_audio(mic_id, send_audio_every=3)
 
 
@@ -1,19 +1,15 @@
 import asyncio
 
-from experiments.models import OverhearingKaniRealtime
-from experiments.prompts import read_prompt
+from experiments.models import connect_realtime_kani
 from overhearing_agents.session import OverhearingAgentsSession
 
-AGENT_INSTRUCTIONS = read_prompt("realtime_tom_0shot_audio.md")
-
 # engine = OpenAIAudioEngine(model="gpt-4o-audio-preview", modalities=["text"])
-# ai = OverhearingKani(engine, system_prompt=AGENT_INSTRUCTIONS)
-ai = OverhearingKaniRealtime()  # the realtime API is like 80% cheaper
+# ai = OverhearingKani(engine, system_prompt=AUDIO_SYSTEM_PROMPT)
 
 
 async def main():
+    ai = await connect_realtime_kani()  # the realtime API is like 80% cheaper
     app = OverhearingAgentsSession(ai)
-    await ai.connect(instructions=AGENT_INSTRUCTIONS, modalities=["text"])
     await app.chat_in_terminal()
 
 
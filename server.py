@@ -4,17 +4,13 @@ Example server for the web interface.
 
 import logging
 
-from experiments.models import OverhearingKaniRealtime
-from experiments.prompts import read_prompt
+from experiments.models import connect_realtime_kani
 from overhearing_agents.server import VizServer
 from overhearing_agents.session import OverhearingAgentsSession
 
-AGENT_INSTRUCTIONS = read_prompt("realtime_tom_0shot_audio.md")
-
 
 async def create_session():
-    ai = OverhearingKaniRealtime()
-    await ai.connect(instructions=AGENT_INSTRUCTIONS, modalities=["text"])
+    ai = await connect_realtime_kani()
     return OverhearingAgentsSession(ai)
 
 